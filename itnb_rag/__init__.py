@@ -5,10 +5,15 @@ This package provides a complete RAG pipeline:
 - Web crawling and preprocessing (preprocess.py)
 - Document ingestion to GroundX (ingest.py)
 - Interactive RAG chat interface (chat.py)
+- Retrieval/prompt parameter tuning (tune.py)
 
 Shared utilities:
 - config: Centralized configuration management
+- crawl_scheduler: Parallel crawling with per-host politeness
 - groundx_utils: GroundX API helpers
+- profiling: --profile support and wall-clock timers
+- singleflight: Coalescing of identical in-flight requests
+- llm_router: Latency-aware routing across LLM endpoints
 - text_processing: Text cleaning and formatting
 """
 
@@ -16,12 +16,16 @@ Usage:
   python -m itnb_rag.preprocess    # Crawl and preprocess ITNB website
   python -m itnb_rag.ingest        # Ingest content to GroundX
   python -m itnb_rag.chat          # Start interactive chat
+  python -m itnb_rag.tune          # Sweep TOP_K/context/max-token settings
 
 Run the commands in order:
   1. preprocess - Crawls itnb.ch and saves to data/
   2. ingest     - Uploads to GroundX vector database
   3. chat       - Interactive RAG Q&A interface
 
+Add --profile to any command to write cProfile, tracemalloc and
+wall-clock reports to data/profiles/.
+
 Configuration:
   Copy .env.example to .env and configure your API keys.
 
@@ -6,25 +6,35 @@ Interactive chat interface that queries GroundX for relevant context,
 then calls an OpenAI-compatible LLM for final answers.
 
 Usage:
-    python -m itnb_rag.chat
+    python -m itnb_rag.chat [--profile]
 """
 
+import argparse
+import hashlib
+import json
 import sys
 import textwrap
 from typing import Optional, Tuple
 
-import requests
-
 from .config import config
-from .groundx_utils import get_client, get_bucket_id, extract_context_and_sources
+from .groundx_utils import get_client, get_bucket_id, extract_context_and_sources, search_content, search_flight
+from .llm_router import get_router
+from .profiling import add_profile_args, idle, profile_run, timed
+from .singleflight import SingleFlight
+
 
+# Coalesces identical in-flight LLM calls (keyed by prompt hash)
+llm_flight = SingleFlight("generation")
 
-def build_system_instruction(context_text: str) -> str:
+
+@timed("cpu.context_building")
+def build_system_instruction(context_text: str, max_sys_len: int = None) -> str:
     """
     Build system message with embedded context for LLM.
 
     Args:
         context_text: Retrieved context from GroundX
+        max_sys_len: System message length limit (uses config.MAX_SYSTEM_CHARS if None)
 
     Returns:
         System message with instructions and context
@@ -39,62 +49,51 @@ def build_system_instruction(context_text: str) -> str:
     system_with_context = system_instruction + "\n===\n" + context_text + "\n===\n"
 
     # Ensure system message isn't too large
-    max_sys_len = 20000
+    if max_sys_len is None:
+        max_sys_len = config.MAX_SYSTEM_CHARS
     if len(system_with_context) > max_sys_len:
         system_with_context = system_with_context[:max_sys_len] + "\n...[TRUNCATED CONTEXT]...\n"
 
     return system_with_context
 
 
-def call_llm(system_message: str, user_message: str) -> Tuple[Optional[str], dict]:
+def build_user_message(question: str) -> str:
     """
-    Call OpenAI-compatible LLM endpoint.
+    Build the user message sent alongside the system context.
+
+    Args:
+        question: User's question
+
+    Returns:
+        Question with answering instructions appended
+    """
+    return question + "\n\nPlease answer using only the provided document context. At the end, include a short 'Sources:' list."
+
+
+def call_llm(
+    system_message: str,
+    user_message: str,
+    max_tokens: int = None
+) -> Tuple[Optional[str], dict]:
+    """
+    Call the LLM through the latency-aware endpoint router.
+
+    Identical concurrent prompts share one in-flight request.
 
     Args:
         system_message: System prompt with context
         user_message: User's question
+        max_tokens: Completion token limit (uses config.LLM_MAX_TOKENS if None)
 
     Returns:
         Tuple of (content_text or None, raw_response_dict)
     """
-    headers = {
-        "Authorization": f"Bearer {config.OPENAI_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    url_chat = config.OPENAI_API_BASE.rstrip("/") + "/v1/chat/completions"
-
-    payload = {
-        "model": config.OPENAI_MODEL_NAME,
-        "messages": [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message}
-        ],
-        "max_tokens": config.LLM_MAX_TOKENS,
-        "temperature": config.LLM_TEMPERATURE,
-    }
+    if max_tokens is None:
+        max_tokens = config.LLM_MAX_TOKENS
 
-    try:
-        r = requests.post(
-            url_chat,
-            headers=headers,
-            json=payload,
-            timeout=config.REQUEST_TIMEOUT
-        )
-    except Exception as e:
-        debug = {"error": f"HTTP exception when calling chat endpoint: {e}"}
-        return None, debug
-
-    if r.status_code == 200:
-        try:
-            j = r.json()
-            content = j["choices"][0]["message"]["content"]
-            return content, j
-        except Exception:
-            return None, {"error": "unexpected JSON shape", "response_text": r.text}
-    else:
-        debug = {"status_code": r.status_code, "response_text": r.text}
-        return None, debug
+    prompt = json.dumps([system_message, user_message, max_tokens, config.LLM_TEMPERATURE])
+    key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return llm_flight.do(key, get_router().call, system_message, user_message, max_tokens)
 
 
 def print_sources(sources: list):
@@ -116,6 +115,23 @@ def print_sources(sources: list):
         print(f" [{i}] {title} — {url} (score={score})")
 
 
+def print_stats():
+    """Display request coalescing counters and LLM endpoint statistics."""
+    print("\nRequest coalescing:")
+    for s in (search_flight.stats(), llm_flight.stats()):
+        print(f" {s['name']}: {s['requests']} requests, {s['executions']} executed, "
+              f"{s['coalesced']} coalesced, {s['errors']} errors")
+
+    print("\nLLM endpoints:")
+    for s in get_router().stats():
+        ewma = f"{s['ewma_s']:.2f}s" if s["ewma_s"] is not None else "n/a"
+        p95 = f"{s['p95_s']:.2f}s" if s["p95_s"] is not None else "n/a"
+        p99 = f"{s['p99_s']:.2f}s" if s["p99_s"] is not None else "n/a"
+        ejected = f", ejected for {s['ejected_for_s']:.0f}s" if s["ejected_for_s"] else ""
+        print(f" {s['endpoint']}: ewma={ewma} p95={p95} p99={p99} samples={s['samples']}{ejected}")
+    print()
+
+
 def interactive_loop(bucket_id: str):
     """
     Main interactive chat loop.
@@ -126,12 +142,13 @@ def interactive_loop(bucket_id: str):
     client = get_client()
 
     print("ITNB RAG CLI — ask questions about the ingested ITNB content.")
-    print("Commands: /help /exit /quit /raw (shows raw combined context)")
+    print("Commands: /help /exit /quit /raw (shows raw combined context) /stats (request statistics)")
     print()
 
     while True:
         try:
-            q = input("itnb> ").strip()
+            with idle():
+                q = input("itnb> ").strip()
         except (KeyboardInterrupt, EOFError):
             print("\nExiting.")
             return
@@ -148,9 +165,13 @@ def interactive_loop(bucket_id: str):
             print("Example: 'What cloud services do they offer for healthcare?'")
             continue
 
+        if q.lower() == "/stats":
+            print_stats()
+            continue
+
         # Perform GroundX search
         try:
-            search_resp = client.search.content(id=bucket_id, query=q)
+            search_resp = search_content(client, bucket_id, q)
             combined_text, sources = extract_context_and_sources(search_resp, top_k=config.TOP_K)
         except Exception as e:
             print(f"Search error: {e}")
@@ -170,7 +191,7 @@ def interactive_loop(bucket_id: str):
             print("No context was retrieved for that query. I'll still try to answer, but I may be less precise.\n")
 
         system_msg = build_system_instruction(combined_text)
-        user_msg = q + "\n\nPlease answer using only the provided document context. At the end, include a short 'Sources:' list."
+        user_msg = build_user_message(q)
 
         print(f"\n[1/2] Retrieved context length: {len(combined_text):,} chars")
         print("[2/2] Sending to LLM... (this may take a few seconds)")
@@ -180,7 +201,7 @@ def interactive_loop(bucket_id: str):
         if answer is None:
             print("\nLLM call failed. Debug info:")
             print(raw)
-            print("\nYou can try reducing context size or checking your OPENAI_MODEL_NAME and OPENAI_API_BASE.")
+            print("\nYou can try reducing context size or checking your OPENAI_MODEL_NAME and OPENAI_API_BASE (or LLM_ENDPOINTS).")
             continue
 
         print("\n--- Answer ---\n")
@@ -204,12 +225,28 @@ def main():
         print("   Run: python -m itnb_rag.ingest")
         sys.exit(1)
 
+    try:
+        router = get_router()
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
     print(f"Using bucket id: {bucket_id}")
-    print(f"Using LLM model: {config.OPENAI_MODEL_NAME} @ {config.OPENAI_API_BASE}")
+    for endpoint in router.endpoints:
+        print(f"Using LLM model: {endpoint.name}")
     print()
 
     interactive_loop(bucket_id)
 
 
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Interactive RAG chat over ingested ITNB content.")
+    add_profile_args(parser)
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    with profile_run("chat", args.profile, args.profile_dir):
+        main()
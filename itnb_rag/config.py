@@ -5,42 +5,91 @@ Loads configuration from environment variables.
 
 import sys
 from os import getenv
+from typing import Callable, List, Optional, Union
 from dotenv import load_dotenv
 
 # Load .env
 load_dotenv()
 
+
+def getenv_number(name: str, default: Union[int, float], cast: Callable = int) -> Union[int, float]:
+    """
+    Read a non-negative number from the environment.
+
+    Falls back to the default (with a warning) for missing, malformed or
+    negative values, so one bad setting doesn't break every command.
+    """
+    raw = getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        value = -1
+    if not value >= 0:  # also rejects NaN
+        print(f"Warning: invalid {name}={raw!r}, using default {default}")
+        return default
+    return value
+
+
 class Config:
     """Centralized configuration for ITNB RAG pipeline."""
 
     # GroundX Configuration (from .env)
     GROUNDX_API_KEY: str = getenv("GROUNDX_API_KEY", "")
     GROUNDX_BUCKET_NAME: str = getenv("GROUNDX_BUCKET_NAME", "itnb_website")
+    GROUNDX_BASE_URL: str = getenv("GROUNDX_BASE_URL", "")  # Optional, e.g. a local stand-in
 
     # OpenAI-compatible LLM Configuration (from .env)
     OPENAI_API_KEY: str = getenv("OPENAI_API_KEY", "")
     OPENAI_API_BASE: str = getenv("OPENAI_API_BASE", "")
     OPENAI_MODEL_NAME: str = getenv("OPENAI_MODEL_NAME", "inference-llama4-maverick")
 
+    # Optional list of LLM endpoints as JSON (from .env), e.g.
+    # [{"base": "https://a.example", "model": "m", "key": "k"}, ...]
+    # Falls back to the single OPENAI_* endpoint when empty.
+    LLM_ENDPOINTS: str = getenv("LLM_ENDPOINTS", "")
+
     # LLM Parameters (hardcoded defaults)
     LLM_MAX_TOKENS: int = 512
     LLM_TEMPERATURE: float = 0.0
     REQUEST_TIMEOUT: int = 60
 
+    # LLM Routing Parameters (hardcoded defaults)
+    LLM_EWMA_ALPHA: float = 0.3           # Weight of the newest latency sample
+    LLM_HEDGE_ENABLED: bool = True        # Send a duplicate request to the next endpoint
+    LLM_HEDGE_PERCENTILE: float = 0.95    # Hedge after this latency percentile
+    LLM_HEDGE_MIN_SAMPLES: int = 5        # Samples needed before hedging kicks in
+    LLM_LATENCY_WINDOW: int = 100         # Latency samples kept per endpoint
+    LLM_EJECT_AFTER_FAILURES: int = 3     # Consecutive failures before ejection
+    LLM_EJECT_SECONDS: float = 30.0       # How long an ejected endpoint is skipped
+
     # RAG Parameters (hardcoded defaults)
-    TOP_K: int = 3
+    TOP_K: int = 3                   # Results listed as sources
+    SEARCH_N: Optional[int] = None   # Results requested from GroundX (None = SDK default)
     MAX_CONTEXT_CHARS: int = 100000
+    MAX_SYSTEM_CHARS: int = 20000
 
-    # Preprocessing Configuration (hardcoded defaults)
-    CRAWL_START_URL: str = "https://www.itnb.ch/en"
-    CRAWL_MAX_DEPTH: int = 2
-    CRAWL_MAX_PAGES: int = 100
+    # Preprocessing Configuration (overridable from .env)
+    CRAWL_START_URL: str = getenv("CRAWL_START_URL", "https://www.itnb.ch/en")
+    CRAWL_MAX_DEPTH: int = getenv_number("CRAWL_MAX_DEPTH", 2)
+    CRAWL_MAX_PAGES: int = getenv_number("CRAWL_MAX_PAGES", 100)
+    CRAWL_URL_PATTERNS: List[str] = [
+        p.strip() for p in getenv("CRAWL_URL_PATTERNS", "https://www.itnb.ch/en*,*itnb.ch/en*").split(",")
+        if p.strip()
+    ]
+    CRAWL_CONCURRENCY: int = getenv_number("CRAWL_CONCURRENCY", 8)              # Concurrent fetch/render workers
+    CRAWL_HOST_CONCURRENCY: int = getenv_number("CRAWL_HOST_CONCURRENCY", 4)    # Max in-flight fetches per host
+    CRAWL_HOST_RATE: float = getenv_number("CRAWL_HOST_RATE", 4.0, float)       # Max fetches started per second per host (0 = unlimited)
+    CRAWL_USE_SITEMAP: bool = getenv("CRAWL_USE_SITEMAP", "true").lower() in ("1", "true", "yes")
+    CRAWL_SITEMAP_URL: str = getenv("CRAWL_SITEMAP_URL", "")                    # Defaults to <host>/sitemap.xml
 
     # Data Paths (hardcoded defaults)
     DATA_DIR: str = "data"
     JSON_PATH: str = "data/itnb_texts.json"
     TXT_PATH: str = "data/itnb_corpus.txt"
     LOG_PATH: str = "data/ingest_log.txt"
+    PROFILE_DIR: str = "data/profiles"
 
     @classmethod
     def validate(cls) -> None:
@@ -52,10 +101,11 @@ class Config:
 
         if not cls.GROUNDX_API_KEY:
             missing.append("GROUNDX_API_KEY")
-        if not cls.OPENAI_API_KEY:
-            missing.append("OPENAI_API_KEY")
-        if not cls.OPENAI_API_BASE:
-            missing.append("OPENAI_API_BASE")
+        if not cls.LLM_ENDPOINTS:
+            if not cls.OPENAI_API_KEY:
+                missing.append("OPENAI_API_KEY")
+            if not cls.OPENAI_API_BASE:
+                missing.append("OPENAI_API_BASE")
 
         if missing:
             print("Missing required environment variables:", ", ".join(missing))
@@ -70,8 +120,11 @@ class Config:
         print(f"  GroundX Bucket: {cls.GROUNDX_BUCKET_NAME}")
         print(f"  LLM Model: {cls.OPENAI_MODEL_NAME}")
         print(f"  LLM API Base: {cls.OPENAI_API_BASE}")
+        if cls.LLM_ENDPOINTS:
+            print("  LLM Endpoints: from LLM_ENDPOINTS")
         print(f"  TOP_K: {cls.TOP_K}")
         print(f"  Max Context: {cls.MAX_CONTEXT_CHARS:,} chars")
+        print(f"  Max System Message: {cls.MAX_SYSTEM_CHARS:,} chars")
         print(f"  Temperature: {cls.LLM_TEMPERATURE}")
         print(f"  Max Tokens: {cls.LLM_MAX_TOKENS}")
 
@@ -0,0 +1,244 @@
+"""
+Parallel crawl scheduler with per-host politeness for the ITNB preprocessor.
+
+Runs a pool of async workers over a shared URL frontier. Each fetch goes
+through a per-host limiter (max in-flight requests and min spacing between
+request starts). The frontier can be seeded from sitemap.xml, in which case
+link discovery is skipped. URLs with non-HTML extensions are skipped before
+fetching, and responses whose Content-Type is not text/html are dropped.
+"""
+
+import asyncio
+import time
+import xml.etree.ElementTree as ET
+from contextlib import asynccontextmanager
+from fnmatch import fnmatch
+from typing import List, Dict, Tuple, Optional
+from urllib.parse import urljoin, urldefrag, urlparse
+
+import requests
+
+from .config import config
+from .profiling import timed
+
+
+# Extensions that never render to an HTML page
+NON_HTML_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico",
+    ".css", ".js", ".json", ".xml", ".zip", ".mp4", ".mp3", ".woff", ".woff2",
+)
+
+
+def url_allowed(url: str, patterns: List[str]) -> bool:
+    """
+    Check whether a URL should be crawled.
+
+    Args:
+        url: Absolute URL
+        patterns: fnmatch-style URL patterns (any match allows the URL)
+
+    Returns:
+        True if the URL is http(s), looks like HTML and matches a pattern
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https"):
+        return False
+    if parsed.path.lower().endswith(NON_HTML_EXTENSIONS):
+        return False
+    return any(fnmatch(url, p) for p in patterns)
+
+
+def is_html_result(result) -> bool:
+    """
+    Check the crawl result's Content-Type header.
+
+    Results without headers are kept; otherwise only text/html passes.
+    """
+    headers = getattr(result, "response_headers", None) or {}
+    content_type = next((v for k, v in headers.items() if k.lower() == "content-type"), "")
+    return not content_type or "text/html" in content_type.lower()
+
+
+def normalize_url(base: str, href: str) -> str:
+    """Resolve a link against its page URL and drop the fragment."""
+    return urldefrag(urljoin(base, href.strip()))[0]
+
+
+def default_sitemap_url(start_url: str) -> str:
+    """Return <scheme>://<host>/sitemap.xml for a start URL."""
+    parsed = urlparse(start_url)
+    return f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"
+
+
+def _fetch_sitemap(sitemap_url: str, limit: int, patterns: List[str], depth: int = 0) -> List[str]:
+    """
+    Fetch allowed page URLs from a sitemap, following sitemap indexes one
+    level deep. URLs are filtered by pattern before the limit is applied.
+    """
+    with timed("network.sitemap"):
+        r = requests.get(sitemap_url, timeout=config.REQUEST_TIMEOUT)
+    r.raise_for_status()
+    root = ET.fromstring(r.content)
+    locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+
+    if not root.tag.endswith("sitemapindex"):
+        return [u for u in locs if url_allowed(u, patterns)][:limit]
+
+    urls = []
+    if depth > 0:
+        return urls
+    for child in locs:
+        if len(urls) >= limit:
+            break
+        try:
+            urls.extend(_fetch_sitemap(child, limit - len(urls), patterns, depth + 1))
+        except Exception as e:
+            print(f"Skipping sitemap {child}: {e}")
+    return urls
+
+
+async def fetch_sitemap_urls(sitemap_url: str, limit: int, patterns: List[str]) -> List[str]:
+    """
+    Fetch page URLs listed in a sitemap.xml (or sitemap index).
+
+    Args:
+        sitemap_url: URL of the sitemap
+        limit: Max URLs to return (applied after pattern filtering)
+        patterns: fnmatch-style URL patterns, as for url_allowed()
+
+    Returns:
+        List of URLs, empty if the sitemap is missing or unparseable
+    """
+    try:
+        return await asyncio.to_thread(_fetch_sitemap, sitemap_url, limit, patterns)
+    except Exception as e:
+        print(f"Sitemap unavailable ({sitemap_url}): {e}")
+        return []
+
+
+class HostLimiter:
+    """Per-host politeness: caps in-flight fetches and spaces request starts."""
+
+    def __init__(self, rate: float, concurrency: int):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.concurrency = max(1, concurrency)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_start: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Hold a fetch slot for the URL's host for the duration of the block."""
+        host = urlparse(url).netloc
+        sem = self._semaphores.setdefault(host, asyncio.Semaphore(self.concurrency))
+        async with sem:
+            # Reserve the next start time for this host (no await in between,
+            # so the reservation is atomic on the event loop)
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, 0.0))
+            self._next_start[host] = start + self.interval
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+
+class CrawlScheduler:
+    """
+    Breadth-first crawl over a shared frontier with N concurrent workers.
+
+    Pages are fetched with crawler.arun(); the page budget (max_pages) is
+    reserved when a URL is enqueued, so no more than max_pages fetches run.
+    """
+
+    def __init__(
+        self,
+        crawler,
+        run_conf,
+        patterns: List[str],
+        concurrency: int = None,
+        max_pages: int = None,
+        max_depth: int = None,
+        limiter: Optional[HostLimiter] = None
+    ):
+        self.crawler = crawler
+        self.run_conf = run_conf
+        self.patterns = patterns
+        self.concurrency = max(1, concurrency or config.CRAWL_CONCURRENCY)
+        self.max_pages = max_pages if max_pages is not None else config.CRAWL_MAX_PAGES
+        self.max_depth = max_depth if max_depth is not None else config.CRAWL_MAX_DEPTH
+        self.limiter = limiter or HostLimiter(config.CRAWL_HOST_RATE, config.CRAWL_HOST_CONCURRENCY)
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._seen: Dict[str, int] = {}
+        self._results: List[Tuple[int, object]] = []
+        self.failed = 0
+        self.skipped = 0
+        self.elapsed = 0.0
+
+    def _enqueue(self, url: str, depth: int) -> None:
+        if url in self._seen or len(self._seen) >= self.max_pages:
+            return
+        if not url_allowed(url, self.patterns):
+            return
+        self._seen[url] = len(self._seen)
+        self._queue.put_nowait((url, depth))
+
+    async def _worker(self, discover: bool) -> None:
+        while True:
+            url, depth = await self._queue.get()
+            try:
+                async with self.limiter.slot(url):
+                    # arun() fetches and also scrapes/renders markdown in-process
+                    with timed("mixed.crawl_render"):
+                        result = await self.crawler.arun(url=url, config=self.run_conf)
+
+                if not result.success:
+                    self.failed += 1
+                    print(f"Failed: {url} — {result.error_message}")
+                    continue
+
+                if not is_html_result(result):
+                    self.skipped += 1
+                    continue
+
+                self._results.append((self._seen[url], result))
+
+                if discover and depth < self.max_depth:
+                    for link in (result.links or {}).get("internal", []):
+                        href = link.get("href") if isinstance(link, dict) else link
+                        if href:
+                            self._enqueue(normalize_url(result.url or url, href), depth + 1)
+            except Exception as e:
+                self.failed += 1
+                print(f"Failed: {url} — {e}")
+            finally:
+                self._queue.task_done()
+
+    async def run(self, seeds: List[str], discover: bool = True) -> List:
+        """
+        Crawl from the seed URLs until the frontier is exhausted.
+
+        Args:
+            seeds: Initial URLs (depth 0)
+            discover: Follow internal links up to max_depth
+
+        Returns:
+            Successful crawl results in discovery order
+        """
+        for url in seeds:
+            self._enqueue(normalize_url(url, url), 0)
+
+        start = time.monotonic()
+        workers = [asyncio.create_task(self._worker(discover)) for _ in range(self.concurrency)]
+        try:
+            await self._queue.join()
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        self.elapsed = time.monotonic() - start
+
+        return [r for _, r in sorted(self._results, key=lambda item: item[0])]
+
+    @property
+    def pages_per_sec(self) -> float:
+        return len(self._results) / self.elapsed if self.elapsed > 0 else 0.0
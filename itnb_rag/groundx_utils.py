@@ -2,21 +2,30 @@
 Shared GroundX utilities for ITNB RAG pipeline.
 """
 
+import re
 from typing import List, Dict, Tuple
 from datetime import datetime, timezone
 
 from groundx import GroundX, Document
 
 from .config import config
+from .profiling import timed
+from .singleflight import SingleFlight
+
+
+# Coalesces identical in-flight searches (keyed by bucket + normalized query)
+search_flight = SingleFlight("retrieval")
 
 
 def get_client() -> GroundX:
     """
     Create and return a configured GroundX client.
-    Uses API key from config.
+    Uses API key (and optional base URL) from config.
     """
     if not config.GROUNDX_API_KEY:
         raise ValueError("GROUNDX_API_KEY not set in environment")
+    if config.GROUNDX_BASE_URL:
+        return GroundX(api_key=config.GROUNDX_API_KEY, base_url=config.GROUNDX_BASE_URL)
     return GroundX(api_key=config.GROUNDX_API_KEY)
 
 
@@ -35,7 +44,8 @@ def get_bucket_id(client: GroundX) -> int:
     """
     # Try to find by name
     print(f"Looking up bucket '{config.GROUNDX_BUCKET_NAME}'...")
-    resp = client.buckets.list()
+    with timed("network.groundx"):
+        resp = client.buckets.list()
     for bucket in resp.buckets:
         if bucket.name == config.GROUNDX_BUCKET_NAME:
             print(f"Found bucket: {bucket.bucket_id}")
@@ -44,7 +54,8 @@ def get_bucket_id(client: GroundX) -> int:
     # Create if not found
     print(f"Bucket not found. Creating '{config.GROUNDX_BUCKET_NAME}'...")
     try:
-        response = client.buckets.create(name=config.GROUNDX_BUCKET_NAME)
+        with timed("network.groundx"):
+            response = client.buckets.create(name=config.GROUNDX_BUCKET_NAME)
         bucket_id = response.bucket.bucket_id
         print(f"Created bucket: {bucket_id}")
         return bucket_id
@@ -52,16 +63,53 @@ def get_bucket_id(client: GroundX) -> int:
         raise RuntimeError(f"Failed to create bucket '{config.GROUNDX_BUCKET_NAME}': {e}")
 
 
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share a key."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def search_content(client: GroundX, bucket_id: int, query: str, n: int = None):
+    """
+    Search a bucket, sharing the call with identical in-flight searches.
+
+    Args:
+        client: GroundX client instance
+        bucket_id: Bucket to search
+        query: Search query
+        n: Number of results to request (uses config.SEARCH_N if None; the
+            SDK default when that is None too). GroundX builds the combined
+            search text from these results, so this bounds the LLM context.
+
+    Returns:
+        GroundX search response
+    """
+    if n is None:
+        n = config.SEARCH_N
+
+    def run():
+        with timed("network.groundx"):
+            if n is None:
+                return client.search.content(id=bucket_id, query=query)
+            return client.search.content(id=bucket_id, query=query, n=n)
+
+    return search_flight.do((bucket_id, n, normalize_query(query)), run)
+
+
+@timed("cpu.context_building")
 def extract_context_and_sources(
     search_resp,
-    top_k: int = None
+    top_k: int = None,
+    max_context_chars: int = None
 ) -> Tuple[str, List[Dict]]:
     """
     Extract combined context text and source information from search response.
 
     Args:
         search_resp: GroundX search response object
-        top_k: Number of top results to include (uses config.TOP_K if None)
+        top_k: Number of top results to list as sources (uses config.TOP_K if None);
+            also limits the fallback context when search.text is empty. The
+            combined search.text is bounded by SEARCH_N (see search_content()).
+        max_context_chars: Context length limit (uses config.MAX_CONTEXT_CHARS if None)
 
     Returns:
         Tuple of (combined_text, sources_list)
@@ -70,14 +118,16 @@ def extract_context_and_sources(
     """
     if top_k is None:
         top_k = config.TOP_K
+    if max_context_chars is None:
+        max_context_chars = config.MAX_CONTEXT_CHARS
 
     if search_resp is None:
         return "", []
 
     # Get combined text from search response
     combined_text = search_resp.search.text or ""
-    if combined_text and len(combined_text) > config.MAX_CONTEXT_CHARS:
-        combined_text = combined_text[:config.MAX_CONTEXT_CHARS] + "\n...[TRUNCATED CONTEXT]...\n"
+    if combined_text and len(combined_text) > max_context_chars:
+        combined_text = combined_text[:max_context_chars] + "\n...[TRUNCATED CONTEXT]...\n"
 
     # Extract individual results for sources
     sources = []
@@ -105,8 +155,8 @@ def extract_context_and_sources(
                 pieces.append(s["text"][:3000])
 
         combined = "\n\n".join(pieces)
-        if len(combined) > config.MAX_CONTEXT_CHARS:
-            combined = combined[:config.MAX_CONTEXT_CHARS] + "\n...[TRUNCATED]...\n"
+        if len(combined) > max_context_chars:
+            combined = combined[:max_context_chars] + "\n...[TRUNCATED]...\n"
         combined_text = combined
 
     return combined_text, sources
@@ -145,17 +195,18 @@ def ingest_document(
         search_data.update(metadata)
 
     try:
-        ingest_resp = client.ingest(
-            documents=[
-                Document(
-                    bucket_id=bucket_id,
-                    file_name=file_name,
-                    file_path=url,
-                    file_type="txt",
-                    search_data=search_data,
-                )
-            ]
-        )
+        with timed("network.groundx"):
+            ingest_resp = client.ingest(
+                documents=[
+                    Document(
+                        bucket_id=bucket_id,
+                        file_name=file_name,
+                        file_path=url,
+                        file_type="txt",
+                        search_data=search_data,
+                    )
+                ]
+            )
         status = ingest_resp.ingest.status or "unknown"
         return True, status
     except Exception as e:
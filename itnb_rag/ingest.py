@@ -5,14 +5,16 @@ ITNB Content Ingestion to GroundX.
 Reads preprocessed ITNB content from JSON and ingests into GroundX bucket.
 
 Usage:
-    python -m itnb_rag.ingest
+    python -m itnb_rag.ingest [--profile]
 """
 
+import argparse
 import json
 import sys
 
 from .config import config
 from .groundx_utils import get_client, get_bucket_id, ingest_document
+from .profiling import add_profile_args, profile_run, timed
 
 
 def load_documents() -> list:
@@ -26,7 +28,7 @@ def load_documents() -> list:
         SystemExit: If JSON file doesn't exist or can't be read
     """
     try:
-        with open(config.JSON_PATH, "r", encoding="utf-8") as f:
+        with open(config.JSON_PATH, "r", encoding="utf-8") as f, timed("cpu.json"):
             data = json.load(f)
         print(f"Loaded {len(data)} documents from {config.JSON_PATH}")
         return data
@@ -90,5 +92,14 @@ def main():
     print("\nIngestion complete!")
 
 
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Ingest preprocessed ITNB content into GroundX.")
+    add_profile_args(parser)
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    with profile_run("ingest", args.profile, args.profile_dir):
+        main()
@@ -0,0 +1,364 @@
+"""
+Latency-aware routing across OpenAI-compatible LLM endpoints.
+
+Each endpoint tracks an EWMA of its response latency plus a window of recent
+samples. Requests go to the fastest healthy endpoint; optionally a hedged
+duplicate is sent to the next-best endpoint once the primary exceeds its
+p95 latency, and whichever answers first wins. Endpoint failures (transport
+errors, timeouts, 429 and 5xx) are scored as a full REQUEST_TIMEOUT in the
+EWMA, so flaky endpoints drift down the ranking; endpoints that keep failing
+are ejected for a cool-down period. Other 4xx responses are the request's
+fault, not the endpoint's, and are returned as-is without failover.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from typing import List, Dict, Optional, Tuple
+
+import requests
+
+from .config import config
+from .profiling import run_profiled, timed
+
+
+def post_chat_completion(
+    base: str,
+    model: str,
+    api_key: str,
+    system_message: str,
+    user_message: str,
+    max_tokens: int = None
+) -> Tuple[Optional[str], dict]:
+    """
+    Send a single chat completion request to one endpoint.
+
+    Args:
+        base: Endpoint base URL
+        model: Model name
+        api_key: API key for the endpoint
+        system_message: System prompt with context
+        user_message: User's question
+        max_tokens: Completion token limit (uses config.LLM_MAX_TOKENS if None)
+
+    Returns:
+        Tuple of (content_text or None, raw_response_dict)
+    """
+    if max_tokens is None:
+        max_tokens = config.LLM_MAX_TOKENS
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+
+    url_chat = base.rstrip("/") + "/v1/chat/completions"
+
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": config.LLM_TEMPERATURE,
+    }
+
+    try:
+        with timed("network.llm"):
+            r = requests.post(
+                url_chat,
+                headers=headers,
+                json=payload,
+                timeout=config.REQUEST_TIMEOUT
+            )
+    except Exception as e:
+        debug = {"error": f"HTTP exception when calling chat endpoint: {e}"}
+        return None, debug
+
+    if r.status_code == 200:
+        try:
+            with timed("cpu.json"):
+                j = r.json()
+            content = j["choices"][0]["message"]["content"]
+            return content, j
+        except Exception:
+            return None, {"error": "unexpected JSON shape", "response_text": r.text}
+    else:
+        debug = {"status_code": r.status_code, "response_text": r.text}
+        return None, debug
+
+
+def is_endpoint_failure(raw: dict) -> bool:
+    """
+    Decide whether a failed call is the endpoint's fault.
+
+    Transport errors, malformed 200 responses, 408, 429 and 5xx count;
+    other 4xx responses (bad request, auth, context too long) do not.
+    """
+    status = raw.get("status_code")
+    if status is None:
+        return True
+    return status in (408, 429) or status >= 500
+
+
+class Endpoint:
+    """One LLM endpoint with its latency and health statistics."""
+
+    def __init__(self, base: str, model: str, api_key: str):
+        self.base = base
+        self.model = model
+        self.api_key = api_key
+        self.ewma: Optional[float] = None
+        self.latencies = deque(maxlen=config.LLM_LATENCY_WINDOW)  # successful calls only
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return f"{self.model} @ {self.base}"
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def _update_ewma(self, latency: float) -> None:
+        # Caller holds self._lock
+        if self.ewma is None:
+            self.ewma = latency
+        else:
+            alpha = config.LLM_EWMA_ALPHA
+            self.ewma = alpha * latency + (1 - alpha) * self.ewma
+
+    def record_success(self, latency: float) -> None:
+        """Fold a successful call's latency into the EWMA and sample window."""
+        with self._lock:
+            self._update_ewma(latency)
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+
+    def record_failure(self, latency: float) -> None:
+        """
+        Count a failed call, ejecting the endpoint once the limit is hit.
+
+        A failure costs the caller at least a retry elsewhere, so it enters
+        the EWMA as max(latency, REQUEST_TIMEOUT). This keeps endpoints that
+        alternate successes and timeouts out of first place. The percentile
+        window (hedge delay, p95/p99) only holds successful latencies.
+        """
+        with self._lock:
+            self._update_ewma(max(latency, config.REQUEST_TIMEOUT))
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= config.LLM_EJECT_AFTER_FAILURES:
+                self.ejected_until = time.monotonic() + config.LLM_EJECT_SECONDS
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Nearest-rank percentile of successful-call latency.
+
+        Returns None until LLM_HEDGE_MIN_SAMPLES samples are available.
+        """
+        with self._lock:
+            if len(self.latencies) < config.LLM_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        idx = max(0, math.ceil(q * len(ordered)) - 1)
+        return ordered[idx]
+
+    def stats(self) -> Dict:
+        """Snapshot of this endpoint's statistics for display."""
+        now = time.monotonic()
+        return {
+            "endpoint": self.name,
+            "ewma_s": self.ewma,
+            "p95_s": self.percentile(0.95),
+            "p99_s": self.percentile(0.99),
+            "samples": len(self.latencies),
+            "consecutive_failures": self.consecutive_failures,
+            "ejected_for_s": max(0.0, self.ejected_until - now),
+        }
+
+
+def load_endpoints() -> List[Endpoint]:
+    """
+    Build the endpoint list from config.
+
+    Uses LLM_ENDPOINTS (JSON list of {"base", "model", "key"}) when set;
+    missing model/key fields fall back to OPENAI_MODEL_NAME/OPENAI_API_KEY.
+    Otherwise returns the single OPENAI_API_BASE endpoint.
+
+    Raises:
+        ValueError: If LLM_ENDPOINTS is not a valid endpoint list, or an
+            entry has no key and OPENAI_API_KEY is not set
+    """
+    if not config.LLM_ENDPOINTS:
+        return [Endpoint(config.OPENAI_API_BASE, config.OPENAI_MODEL_NAME, config.OPENAI_API_KEY)]
+
+    try:
+        entries = json.loads(config.LLM_ENDPOINTS)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"LLM_ENDPOINTS is not valid JSON: {e}")
+
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("LLM_ENDPOINTS must be a non-empty JSON list")
+
+    endpoints = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get("base"):
+            raise ValueError(f"LLM_ENDPOINTS entry needs a 'base' URL: {entry!r}")
+        api_key = entry.get("key") or config.OPENAI_API_KEY
+        if not api_key:
+            raise ValueError(
+                f"LLM_ENDPOINTS entry for {entry['base']} has no 'key' and OPENAI_API_KEY is not set"
+            )
+        endpoints.append(Endpoint(
+            base=entry["base"],
+            model=entry.get("model") or config.OPENAI_MODEL_NAME,
+            api_key=api_key,
+        ))
+    return endpoints
+
+
+class LLMRouter:
+    """Routes chat completions to the fastest healthy endpoint."""
+
+    def __init__(self, endpoints: List[Endpoint]):
+        self.endpoints = endpoints
+
+    @staticmethod
+    def _spawn(fn, *args) -> Future:
+        """
+        Run fn on a daemon thread and return a Future for its result.
+
+        Losing hedged requests keep running to completion (their latency
+        still feeds the statistics). Daemon threads keep them from holding
+        up interpreter exit, which a ThreadPoolExecutor would do.
+        """
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(run_profiled(fn, *args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="llm-router", daemon=True).start()
+        return future
+
+    def rank(self) -> List[Endpoint]:
+        """
+        Order endpoints by preference.
+
+        Healthy endpoints whose last call succeeded come first, by EWMA
+        latency; unmeasured endpoints follow (they get measured as hedges
+        or failovers), then endpoints with recent failures. If every
+        endpoint is ejected, the one whose ejection expires soonest is
+        returned as a last resort.
+        """
+        now = time.monotonic()
+        healthy = [e for e in self.endpoints if e.is_healthy(now)]
+        if not healthy:
+            return [min(self.endpoints, key=lambda e: e.ejected_until)]
+        return sorted(healthy, key=lambda e: (e.consecutive_failures > 0, e.ewma is None, e.ewma or 0.0))
+
+    def _attempt(
+        self,
+        endpoint: Endpoint,
+        system_message: str,
+        user_message: str,
+        max_tokens: Optional[int]
+    ) -> Tuple[Optional[str], dict, bool]:
+        """Returns (content, raw, endpoint_failed)."""
+        start = time.monotonic()
+        content, raw = post_chat_completion(
+            endpoint.base, endpoint.model, endpoint.api_key, system_message, user_message, max_tokens
+        )
+        elapsed = time.monotonic() - start
+        if content is not None:
+            endpoint.record_success(elapsed)
+            return content, raw, False
+
+        raw = dict(raw, endpoint=endpoint.name)
+        if not is_endpoint_failure(raw):
+            return None, raw, False
+        endpoint.record_failure(elapsed)
+        return None, raw, True
+
+    def _hedge_delay(self, endpoint: Endpoint) -> Optional[float]:
+        if not config.LLM_HEDGE_ENABLED:
+            return None
+        return endpoint.percentile(config.LLM_HEDGE_PERCENTILE)
+
+    def call(
+        self,
+        system_message: str,
+        user_message: str,
+        max_tokens: int = None
+    ) -> Tuple[Optional[str], dict]:
+        """
+        Call the LLM through the best available endpoint.
+
+        The primary request may be hedged once with the next-ranked endpoint
+        after the primary's p95 latency. If every in-flight request fails,
+        the next endpoint is tried until the list is exhausted. Client
+        errors (4xx other than 408/429) are returned immediately.
+
+        Returns:
+            Tuple of (content_text or None, raw_response_dict)
+        """
+        candidates = self.rank()
+        pending = {}
+        hedged = False
+        last_debug = {"error": "no LLM endpoints available"}
+
+        def launch():
+            endpoint = candidates.pop(0)
+            future = self._spawn(self._attempt, endpoint, system_message, user_message, max_tokens)
+            pending[future] = endpoint
+
+        launch()
+        while pending:
+            timeout = None
+            if not hedged and candidates and len(pending) == 1:
+                timeout = self._hedge_delay(next(iter(pending.values())))
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Primary is slower than its p95: race a duplicate request
+                hedged = True
+                launch()
+                continue
+
+            for future in done:
+                pending.pop(future)
+                content, raw, endpoint_failed = future.result()
+                if content is not None or not endpoint_failed:
+                    # Success, or a client error no other endpoint would fix
+                    return content, raw
+                last_debug = raw
+
+            # Everything in flight failed: fail over to the next endpoint
+            if not pending and candidates:
+                launch()
+
+        return None, last_debug
+
+    def stats(self) -> List[Dict]:
+        """Per-endpoint latency and health statistics."""
+        return [e.stats() for e in self.endpoints]
+
+
+_router: Optional[LLMRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> LLMRouter:
+    """Return the shared router, building it from config on first use."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = LLMRouter(load_endpoints())
+        return _router
@@ -6,9 +6,10 @@ Crawls the ITNB website using crawl4ai, extracts and cleans content,
 then saves results to JSON and TXT formats for ingestion.
 
 Usage:
-    python -m itnb_rag.preprocess
+    python -m itnb_rag.preprocess [--profile]
 """
 
+import argparse
 import asyncio
 import json
 import os
@@ -16,10 +17,10 @@ from typing import List, Dict
 
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, CacheMode
 from crawl4ai.content_scraping_strategy import LXMLWebScrapingStrategy
-from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
-from crawl4ai.deep_crawling.filters import FilterChain, URLPatternFilter, ContentTypeFilter
 
 from .config import config
+from .crawl_scheduler import CrawlScheduler, default_sitemap_url, fetch_sitemap_urls
+from .profiling import add_profile_args, profile_run, timed
 from .text_processing import md_to_text
 
 
@@ -27,36 +28,44 @@ async def crawl_itnb() -> List[Dict]:
     """
     Crawl ITNB website and extract content.
 
+    Seeds the crawl from sitemap.xml when available (skipping link
+    discovery), otherwise runs a BFS from CRAWL_START_URL. Pages are
+    fetched by CRAWL_CONCURRENCY workers with per-host rate limits.
+
     Returns:
         List of dicts with keys: url, title, content
     """
-    # Filters: only /en pages on itnb.ch, only text/html
-    filter_chain = FilterChain([
-        URLPatternFilter(patterns=[
-            "https://www.itnb.ch/en*",
-            "*itnb.ch/en*"
-        ]),
-        ContentTypeFilter(allowed_types=["text/html"])
-    ])
-
+    # Filters (only /en pages on itnb.ch, only HTML) are applied by the scheduler
     run_conf = CrawlerRunConfig(
         cache_mode=CacheMode.BYPASS,
-        deep_crawl_strategy=BFSDeepCrawlStrategy(
-            max_depth=config.CRAWL_MAX_DEPTH,
-            include_external=False,
-            filter_chain=filter_chain,
-            max_pages=config.CRAWL_MAX_PAGES
-        ),
         scraping_strategy=LXMLWebScrapingStrategy(),
         verbose=True
     )
 
+    seeds = [config.CRAWL_START_URL]
+    discover = True
+    if config.CRAWL_USE_SITEMAP:
+        sitemap_url = config.CRAWL_SITEMAP_URL or default_sitemap_url(config.CRAWL_START_URL)
+        sitemap_urls = await fetch_sitemap_urls(
+            sitemap_url, limit=config.CRAWL_MAX_PAGES, patterns=config.CRAWL_URL_PATTERNS
+        )
+        if sitemap_urls:
+            print(f"Seeded {len(sitemap_urls)} URLs from {sitemap_url}")
+            if len(sitemap_urls) >= config.CRAWL_MAX_PAGES:
+                print(f"Sitemap has more matching URLs than CRAWL_MAX_PAGES={config.CRAWL_MAX_PAGES}; "
+                      "raise it to crawl them all")
+            seeds += sitemap_urls
+            discover = False
+
     results = []
     print(f"Starting crawl from: {config.CRAWL_START_URL}")
     print(f"Max depth: {config.CRAWL_MAX_DEPTH}, Max pages: {config.CRAWL_MAX_PAGES}")
+    print(f"Workers: {config.CRAWL_CONCURRENCY}, Per-host: {config.CRAWL_HOST_CONCURRENCY} in flight, "
+          f"{config.CRAWL_HOST_RATE} req/s")
 
     async with AsyncWebCrawler() as crawler:
-        crawl_results = await crawler.arun(url=config.CRAWL_START_URL, config=run_conf)
+        scheduler = CrawlScheduler(crawler, run_conf, patterns=config.CRAWL_URL_PATTERNS)
+        crawl_results = await scheduler.run(seeds, discover=discover)
 
         for r in crawl_results:
             # Prefer "fit_markdown" if present; else raw markdown
@@ -69,7 +78,8 @@ async def crawl_itnb() -> List[Dict]:
                 "content": text
             })
 
-    print(f"Crawled {len(results)} pages")
+    print(f"Crawled {len(results)} pages ({scheduler.failed} failed, {scheduler.skipped} non-HTML skipped) "
+          f"in {scheduler.elapsed:.1f}s — {scheduler.pages_per_sec:.2f} pages/sec")
     return results
 
 
@@ -83,7 +93,7 @@ def persist(pages: List[Dict]) -> None:
     os.makedirs(config.DATA_DIR, exist_ok=True)
 
     # Save as structured JSON
-    with open(config.JSON_PATH, "w", encoding="utf-8") as f:
+    with open(config.JSON_PATH, "w", encoding="utf-8") as f, timed("cpu.json"):
         json.dump(pages, f, ensure_ascii=False, indent=2)
 
     # Save as flat corpus file (useful for embeddings)
@@ -105,5 +115,14 @@ async def main():
     print("\nPreprocessing complete!")
 
 
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Crawl and preprocess the ITNB website.")
+    add_profile_args(parser)
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    with profile_run("preprocess", args.profile, args.profile_dir):
+        asyncio.run(main())
@@ -0,0 +1,242 @@
+"""
+Profiling support for the ITNB RAG pipeline commands.
+
+Every entry point accepts --profile. When set, the run is wrapped in
+cProfile and tracemalloc, and three files are written to PROFILE_DIR:
+- <command>-<timestamp>.pstats     cProfile stats (open with pstats/snakeviz)
+- <command>-<timestamp>-alloc.txt  tracemalloc top allocations
+- <command>-<timestamp>-summary.txt wall-clock breakdown by category
+
+The wall-clock breakdown comes from timed() blocks placed around network
+calls ("network.*"), CPU-heavy steps ("cpu.*") and steps that mix both
+("mixed.*", e.g. crawl4ai fetching and rendering a page in one call).
+Time spent waiting on the user (idle(), "idle.*") is paused in cProfile and
+subtracted from wall clock. Work handed to other threads through
+run_profiled() (e.g. LLM requests on router threads) gets its own profiler,
+merged into the dumped stats. Timings are recorded on every run (the
+overhead is a perf_counter call) but only reported when profiling is enabled.
+"""
+
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .config import config
+
+
+TOP_ALLOCATIONS = 25
+TOP_FUNCTIONS = 30
+
+_timings: Dict[str, List[float]] = {}
+_timings_lock = threading.Lock()
+_active_profiler: Optional[cProfile.Profile] = None
+_thread_profilers: List[cProfile.Profile] = []
+_thread_profilers_lock = threading.Lock()
+
+
+@contextmanager
+def timed(category: str):
+    """
+    Accumulate the wall-clock time of a block under a category.
+
+    Usable as a context manager or a decorator. Categories are dotted
+    names whose first part is the group, e.g. "network.llm" or
+    "cpu.md_to_text".
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _timings_lock:
+            entry = _timings.setdefault(category, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+
+@contextmanager
+def idle(category: str = "idle.input"):
+    """
+    Mark a block as waiting on the user (e.g. input()).
+
+    The time is recorded under an "idle.*" category, excluded from the
+    active wall clock, and cProfile is paused for the duration.
+    """
+    profiler = _active_profiler
+    if profiler is not None:
+        profiler.disable()
+    try:
+        with timed(category):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.enable()
+
+
+def run_profiled(fn, *args, **kwargs):
+    """
+    Call fn, profiling it in the current thread if a profile run is active.
+
+    cProfile only hooks the thread that enabled it, so worker threads wrap
+    their work in this. Profilers of calls that finish before the run ends
+    are merged into the .pstats output.
+    """
+    if _active_profiler is None:
+        return fn(*args, **kwargs)
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        with _thread_profilers_lock:
+            _thread_profilers.append(profiler)
+
+
+def reset_timings() -> None:
+    """Clear all recorded timings."""
+    with _timings_lock:
+        _timings.clear()
+
+
+def get_timings() -> Dict[str, Dict]:
+    """Return recorded timings as {category: {"seconds", "calls"}}."""
+    with _timings_lock:
+        return {k: {"seconds": v[0], "calls": v[1]} for k, v in _timings.items()}
+
+
+def add_profile_args(parser: argparse.ArgumentParser) -> None:
+    """Add --profile and --profile-dir options to a command's parser."""
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write cProfile, tracemalloc and wall-clock reports for this run"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=config.PROFILE_DIR,
+        help=f"Directory for profile reports (default: {config.PROFILE_DIR})"
+    )
+
+
+def format_summary(command: str, wall: float, cpu: float, timings: Dict[str, Dict]) -> str:
+    """
+    Format the wall-clock summary report.
+
+    Args:
+        command: Command name
+        wall: Total wall-clock seconds
+        cpu: Total process CPU seconds
+        timings: Output of get_timings()
+
+    Returns:
+        Report text
+    """
+    idle_time = sum(t["seconds"] for c, t in timings.items() if c.split(".", 1)[0] == "idle")
+    lines = [
+        f"Profile summary: {command}",
+        f"  Wall clock:   {wall:10.3f} s",
+    ]
+    if idle_time:
+        lines.append(f"  Idle (user):  {idle_time:10.3f} s")
+        lines.append(f"  Active wall:  {wall - idle_time:10.3f} s")
+    lines.append(f"  Process CPU:  {cpu:10.3f} s")
+    lines.append("")
+
+    groups: Dict[str, float] = {}
+    for category, t in timings.items():
+        group = category.split(".", 1)[0]
+        groups[group] = groups.get(group, 0.0) + t["seconds"]
+
+    for group in sorted(groups):
+        lines.append(f"  {group:<28} {groups[group]:10.3f} s")
+        for category in sorted(c for c in timings if c.split(".", 1)[0] == group):
+            t = timings[category]
+            lines.append(f"    {category:<26} {t['seconds']:10.3f} s  ({t['calls']} calls)")
+
+    lines.append("")
+    lines.append("  Network and mixed time is summed across concurrent requests and can exceed wall clock.")
+    if "mixed.crawl_render" in timings:
+        lines.append("  mixed.crawl_render covers crawl4ai's fetch, scraping and markdown generation together.")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profile_run(command: str, enabled: bool, out_dir: str = None):
+    """
+    Profile the enclosed block and write reports on exit.
+
+    Does nothing when enabled is False. Reports are written even if the
+    block raises (including SystemExit).
+
+    Args:
+        command: Command name used in report file names
+        enabled: Whether to profile
+        out_dir: Report directory (uses config.PROFILE_DIR if None)
+    """
+    if not enabled:
+        yield
+        return
+
+    out_dir = out_dir or config.PROFILE_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, f"{command}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+
+    global _active_profiler
+    reset_timings()
+    with _thread_profilers_lock:
+        _thread_profilers.clear()
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    _active_profiler = profiler
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _active_profiler = None
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # cProfile stats (binary, main + worker threads) plus a readable
+        # top-N by cumulative time
+        stats_text = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stats_text)
+        with _thread_profilers_lock:
+            if _thread_profilers:
+                stats.add(*_thread_profilers)
+            _thread_profilers.clear()
+        stats.dump_stats(stem + ".pstats")
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+        with open(stem + "-alloc.txt", "w", encoding="utf-8") as f:
+            f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB\n")
+            f.write(f"Top {TOP_ALLOCATIONS} allocations by line:\n")
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                f.write(f"  {stat}\n")
+
+        summary = format_summary(command, wall, cpu, get_timings())
+        with open(stem + "-summary.txt", "w", encoding="utf-8") as f:
+            f.write(summary)
+            f.write("\n")
+            f.write(stats_text.getvalue())
+
+        print()
+        print(summary)
+        print(f"Profile: {stem}.pstats")
+        print(f"Allocations: {stem}-alloc.txt")
+        print(f"Summary: {stem}-summary.txt")
@@ -0,0 +1,110 @@
+"""
+In-flight request coalescing ("singleflight") for the ITNB RAG pipeline.
+
+Concurrent calls with the same key share one execution: the first caller
+runs the function, later callers wait for it and receive the same result
+or exception (each waiter raises its own copy, chained to the original, so
+tracebacks don't pile up on a shared instance). Nothing is cached; once the call finishes the key is free
+again.
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """A pending call that waiters block on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with identical keys into one execution."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) unless a call with the same key is in flight.
+
+        Args:
+            key: Identity of the call
+            fn: Function to run
+
+        Returns:
+            The (shared) result of fn
+
+        Raises:
+            Whatever Exception fn raised: the original in the calling thread,
+            a copy chained from it in every waiter (RuntimeError if it can't
+            be copied). KeyboardInterrupt/SystemExit propagate only in the
+            calling thread; waiters get a RuntimeError instead.
+        """
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise self._waiter_error(call.error) from call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        except BaseException:
+            # Don't re-raise an interrupt in other threads; just release them
+            call.error = RuntimeError(f"{self.name} call was interrupted")
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _waiter_error(self, error: BaseException) -> BaseException:
+        """A fresh exception for one waiter, so the shared one's traceback is never touched."""
+        try:
+            clone = copy.copy(error)
+        except Exception:
+            clone = None
+        if type(clone) is not type(error):
+            clone = RuntimeError(f"{self.name} call failed: {error!r}")
+        return clone.with_traceback(None)
+
+    def stats(self) -> Dict:
+        """Counters for this flight group."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "requests": self.requests,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "in_flight": len(self._calls),
+            }
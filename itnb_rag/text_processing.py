@@ -7,7 +7,10 @@ import re
 import mistune
 from bs4 import BeautifulSoup
 
+from .profiling import timed
 
+
+@timed("cpu.md_to_text")
 def md_to_text(md: str) -> str:
     """
     Convert Markdown to plain text suitable for ingestion.
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+ITNB RAG Parameter Tuner.
+
+Replays a question set over a grid of retrieval/prompt settings (SEARCH_N,
+MAX_CONTEXT_CHARS, MAX_SYSTEM_CHARS, LLM_MAX_TOKENS), measures end-to-end
+latency, prompt tokens and answer overlap with reference answers, then
+recommends the cheapest setting within a quality tolerance of the best.
+
+SEARCH_N is the number of results requested from GroundX, which bounds the
+combined context text; "default" searches as chat currently does (the
+configured SEARCH_N, which is the SDK default until a value is adopted).
+TOP_K only picks the sources listed to the user, so it is not swept. Each
+question is searched once per SEARCH_N value and the response reused for
+the other settings (which don't affect retrieval); the search latency is
+added to every setting's end-to-end latency. Point GROUNDX_BASE_URL and
+OPENAI_API_BASE / LLM_ENDPOINTS at local stand-ins to tune offline.
+
+Questions file: JSON list of {"question": "...", "reference": "..."}.
+
+Usage:
+    python -m itnb_rag.tune --questions data/tune_questions.json [--profile]
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter
+from typing import List, Dict, Optional
+
+from .chat import build_system_instruction, build_user_message, call_llm
+from .config import config
+from .groundx_utils import get_client, get_bucket_id, extract_context_and_sources, search_content
+from .profiling import add_profile_args, profile_run
+
+
+DEFAULT_QUESTIONS_PATH = "data/tune_questions.json"
+DEFAULT_RESULTS_PATH = "data/tune_results.json"
+
+
+def load_questions(path: str) -> List[Dict]:
+    """
+    Load the question set from JSON.
+
+    Returns:
+        List of dicts with keys: question, reference
+
+    Raises:
+        SystemExit: If the file is missing or malformed
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: {path} not found")
+        print('Create a JSON list of {"question": ..., "reference": ...} objects.')
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error loading questions: {e}")
+        sys.exit(1)
+
+    if not isinstance(data, list) or not all(
+        isinstance(item, dict) and item.get("question") and "reference" in item for item in data
+    ):
+        print(f"Error: {path} must be a list of objects with 'question' and 'reference'")
+        sys.exit(1)
+
+    print(f"Loaded {len(data)} questions from {path}")
+    return data
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for overlap scoring."""
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def overlap_f1(answer: str, reference: str) -> float:
+    """
+    Token-overlap F1 between an answer and its reference answer.
+
+    Returns:
+        Score in [0, 1]; 0 if either side is empty
+    """
+    answer_tokens = tokenize(answer)
+    reference_tokens = tokenize(reference)
+    if not answer_tokens or not reference_tokens:
+        return 0.0
+
+    common = sum((Counter(answer_tokens) & Counter(reference_tokens)).values())
+    if common == 0:
+        return 0.0
+    precision = common / len(answer_tokens)
+    recall = common / len(reference_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars/token) when the endpoint reports no usage."""
+    return (len(text) + 3) // 4
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = max(0, math.ceil(q * len(ordered)) - 1)
+    return ordered[idx]
+
+
+def parse_int_list(value: str) -> List[int]:
+    """Parse a comma-separated list of ints for argparse."""
+    try:
+        return [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated integers, got '{value}'")
+
+
+def parse_search_n_list(value: str) -> List[Optional[int]]:
+    """Parse comma-separated SEARCH_N values; "default" means config.SEARCH_N."""
+    values = []
+    for v in value.split(","):
+        v = v.strip()
+        if not v:
+            continue
+        if v.lower() == "default":
+            values.append(None)
+            continue
+        try:
+            values.append(int(v))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected integers or 'default', got '{value}'")
+    return values
+
+
+def format_search_n(n: Optional[int]) -> str:
+    return "default" if n is None else str(n)
+
+
+def build_grid(
+    search_n: List[Optional[int]],
+    max_context_chars: List[int],
+    max_system_chars: List[int],
+    max_tokens: List[int]
+) -> List[Dict]:
+    """Cartesian product of the settings as a list of dicts."""
+    return [
+        {"search_n": n, "max_context_chars": c, "max_system_chars": s, "max_tokens": t}
+        for n, c, s, t in itertools.product(search_n, max_context_chars, max_system_chars, max_tokens)
+    ]
+
+
+def retrieve_all(client, bucket_id: int, questions: List[Dict], search_n_values: List[Optional[int]]) -> Dict:
+    """
+    Search GroundX once per (question, SEARCH_N) pair.
+
+    Returns:
+        Dict keyed by (question_index, search_n) with values of dicts with
+        keys: response (or None on error), latency
+    """
+    retrieved = {}
+    for i, item in enumerate(questions):
+        for n in dict.fromkeys(search_n_values):
+            start = time.perf_counter()
+            try:
+                resp = search_content(client, bucket_id, item["question"], n=n)
+            except Exception as e:
+                print(f"Search error for '{item['question']}' (search_n={format_search_n(n)}): {e}")
+                resp = None
+            retrieved[(i, n)] = {"response": resp, "latency": time.perf_counter() - start}
+    return retrieved
+
+
+def evaluate_setting(setting: Dict, questions: List[Dict], retrieved: Dict) -> Dict:
+    """
+    Run every question through one setting.
+
+    Returns:
+        Setting dict extended with aggregated metrics
+    """
+    latencies, prompt_tokens, completion_tokens, scores = [], [], [], []
+    failures = 0
+
+    for i, item in enumerate(questions):
+        hit = retrieved[(i, setting["search_n"])]
+        start = time.perf_counter()
+        combined_text, _ = extract_context_and_sources(
+            hit["response"],
+            max_context_chars=setting["max_context_chars"]
+        )
+        system_msg = build_system_instruction(combined_text, max_sys_len=setting["max_system_chars"])
+        user_msg = build_user_message(item["question"])
+        answer, raw = call_llm(system_msg, user_msg, max_tokens=setting["max_tokens"])
+        latencies.append(hit["latency"] + time.perf_counter() - start)
+
+        usage = (raw.get("usage") or {}) if answer is not None else {}
+        prompt_tokens.append(usage.get("prompt_tokens") or estimate_tokens(system_msg + user_msg))
+        completion_tokens.append(usage.get("completion_tokens") or estimate_tokens(answer or ""))
+
+        if answer is None:
+            failures += 1
+        scores.append(overlap_f1(answer or "", item["reference"]))
+
+    n = max(1, len(questions))
+    return dict(
+        setting,
+        quality=sum(scores) / n,
+        prompt_tokens=sum(prompt_tokens) / n,
+        completion_tokens=sum(completion_tokens) / n,
+        latency_mean=sum(latencies) / n,
+        latency_p95=percentile(latencies, 0.95),
+        failures=failures,
+    )
+
+
+def recommend(results: List[Dict], tolerance: float) -> Optional[Dict]:
+    """
+    Pick the cheapest setting whose quality is within tolerance of the best.
+
+    Cost is mean prompt + completion tokens; ties go to lower p95 latency.
+    Settings with failed LLM calls are skipped unless every setting had failures.
+    """
+    candidates = [r for r in results if r["failures"] == 0] or results
+    if not candidates:
+        return None
+
+    best_quality = max(r["quality"] for r in candidates)
+    eligible = [r for r in candidates if r["quality"] >= best_quality - tolerance]
+    return min(eligible, key=lambda r: (r["prompt_tokens"] + r["completion_tokens"], r["latency_p95"]))
+
+
+def print_results(results: List[Dict]) -> None:
+    """Display the grid results as a table."""
+    print(f"\n{'search_n':>8} {'ctx_chars':>10} {'sys_chars':>10} {'max_tok':>7} "
+          f"{'quality':>7} {'prompt_tok':>10} {'compl_tok':>9} {'lat_mean':>8} {'lat_p95':>8} {'fail':>4}")
+    for r in results:
+        print(f"{format_search_n(r['search_n']):>8} {r['max_context_chars']:>10,} {r['max_system_chars']:>10,} {r['max_tokens']:>7} "
+              f"{r['quality']:>7.3f} {r['prompt_tokens']:>10.0f} {r['completion_tokens']:>9.0f} "
+              f"{r['latency_mean']:>7.2f}s {r['latency_p95']:>7.2f}s {r['failures']:>4}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Sweep retrieval/prompt settings and recommend the cheapest.")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS_PATH,
+                        help=f"Question set JSON (default: {DEFAULT_QUESTIONS_PATH})")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_PATH,
+                        help=f"Where to write results JSON (default: {DEFAULT_RESULTS_PATH})")
+    parser.add_argument("--search-n", type=parse_search_n_list, default=[None, 3, 5, 10],
+                        help="Comma-separated SEARCH_N values, 'default' for the configured one "
+                             "(default: default,3,5,10)")
+    parser.add_argument("--max-context-chars", type=parse_int_list, default=[5000, 20000, 100000],
+                        help="Comma-separated MAX_CONTEXT_CHARS values (default: 5000,20000,100000)")
+    parser.add_argument("--max-system-chars", type=parse_int_list, default=[5000, 20000],
+                        help="Comma-separated MAX_SYSTEM_CHARS values (default: 5000,20000)")
+    parser.add_argument("--max-tokens", type=parse_int_list, default=[256, 512],
+                        help="Comma-separated LLM_MAX_TOKENS values (default: 256,512)")
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="Allowed quality drop from the best setting (default: 0.02)")
+    add_profile_args(parser)
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace):
+    """Main tuning entry point."""
+    config.validate()
+    questions = load_questions(args.questions)
+
+    client = get_client()
+    try:
+        bucket_id = get_bucket_id(client)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    grid = build_grid(args.search_n, args.max_context_chars, args.max_system_chars, args.max_tokens)
+    print(f"Evaluating {len(grid)} settings x {len(questions)} questions")
+
+    retrieved = retrieve_all(client, bucket_id, questions, args.search_n)
+
+    results = []
+    for i, setting in enumerate(grid, start=1):
+        print(f"[{i}/{len(grid)}] {setting}")
+        results.append(evaluate_setting(setting, questions, retrieved))
+
+    print_results(results)
+    best = recommend(results, args.tolerance)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"tolerance": args.tolerance, "results": results, "recommended": best}, f, indent=2)
+    print(f"\nResults: {args.output}")
+
+    if best is None:
+        print("No settings evaluated.")
+        return
+
+    print("\nRecommended setting (cheapest within tolerance):")
+    print(f"  SEARCH_N: {config.SEARCH_N if best['search_n'] is None else best['search_n']} "
+          f"({'current' if best['search_n'] is None else 'set in config.py to adopt'})")
+    print(f"  MAX_CONTEXT_CHARS: {best['max_context_chars']:,}")
+    print(f"  MAX_SYSTEM_CHARS: {best['max_system_chars']:,}")
+    print(f"  LLM_MAX_TOKENS: {best['max_tokens']}")
+    print(f"  quality={best['quality']:.3f}, prompt_tokens={best['prompt_tokens']:.0f}, "
+          f"p95 latency={best['latency_p95']:.2f}s")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with profile_run("tune", args.profile, args.profile_dir):
+        main(args)